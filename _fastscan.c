@@ -0,0 +1,440 @@
+/*
+ * Lectura de directorios en C para sistemas POSIX. main.py solo la usa en Linux;
+ * en macOS se mantiene el lector getattrlistbulk de mac_fastwalk.py.
+ *
+ * scan_dir(dir_path, excluded_dirs, min_size_bytes, accept_name=None) -> (subdirs, files)
+ *
+ * Mismo contrato que main._scan_dir: 'files' son tuplas (tamaño, ruta) mayores o
+ * iguales a 'min_size_bytes'. Cada directorio se lee en tres fases:
+ *   1. opendir/readdir sin el GIL: se guardan los nombres y su d_type;
+ *   2. con el GIL, 'accept_name' (si hay) descarta los archivos DT_REG por nombre;
+ *   3. fstatat sin el GIL, solo para los archivos aceptados y los DT_UNKNOWN.
+ * Así los hilos del ThreadPoolExecutor de main.py leen directorios en paralelo y
+ * no se pide el tamaño de archivos que el filtro de extensiones va a descartar.
+ * Solo se crean objetos de Python para los subdirectorios y los archivos grandes.
+ * Los DT_UNKNOWN (sistemas de archivos que no rellenan d_type) se filtran después
+ * del fstatat, cuando ya se sabe si son archivos.
+ *
+ * scan_dir_cached(dir_path, excluded_dirs, min_size_bytes, accept_name, cached_mtime)
+ *     -> (mtime_ns, subdirs, files)
+ *
+ * Igual, pero con el mtime del directorio tomado con fstat sobre el descriptor ya
+ * abierto; si coincide con 'cached_mtime' no se lee y devuelve (mtime_ns, None, None).
+ *
+ * Compilar con: python setup.py build_ext --inplace
+ */
+#define PY_SSIZE_T_CLEAN
+#include <Python.h>
+
+#include <dirent.h>
+#include <fcntl.h>
+#include <stdlib.h>
+#include <string.h>
+#include <sys/stat.h>
+
+/* st_mtim en Linux, st_mtimespec en macOS */
+#ifdef __APPLE__
+#define ST_MTIME_NS(st) ((long long)(st).st_mtimespec.tv_sec * 1000000000LL + (st).st_mtimespec.tv_nsec)
+#else
+#define ST_MTIME_NS(st) ((long long)(st).st_mtim.tv_sec * 1000000000LL + (st).st_mtim.tv_nsec)
+#endif
+
+/* Tipo de cada entrada guardada */
+enum {
+    KIND_DIR,      /* Directorio */
+    KIND_FILE,     /* Archivo regular (DT_REG) */
+    KIND_UNKNOWN,  /* DT_UNKNOWN: el tipo se sabe después del fstatat */
+    KIND_SKIP      /* Descartado por nombre, por tamaño o por error de fstatat */
+};
+
+typedef struct {
+    char *name;
+    int kind;
+    int checked;    /* 1 si 'accept_name' ya aceptó el nombre */
+    long long size;
+} scan_entry;
+
+typedef struct {
+    scan_entry *items;
+    size_t len;
+    size_t cap;
+} scan_entries;
+
+/* Resultado de open_dir para el mtime del directorio */
+enum {
+    MTIME_NONE,      /* No se pidió o no se pudo obtener */
+    MTIME_READ,      /* Se obtuvo y el directorio se lee */
+    MTIME_UNCHANGED  /* Coincide con el de la caché: no se lee */
+};
+
+static int
+entries_push(scan_entries *entries, const char *name, int kind)
+{
+    if (entries->len == entries->cap) {
+        size_t cap = entries->cap ? entries->cap * 2 : 64;
+        scan_entry *items = realloc(entries->items, cap * sizeof(scan_entry));
+        if (items == NULL) {
+            return -1;
+        }
+        entries->items = items;
+        entries->cap = cap;
+    }
+    char *copy = strdup(name);
+    if (copy == NULL) {
+        return -1;
+    }
+    entries->items[entries->len].name = copy;
+    entries->items[entries->len].kind = kind;
+    entries->items[entries->len].checked = 0;
+    entries->items[entries->len].size = -1;
+    entries->len++;
+    return 0;
+}
+
+static void
+entries_free(scan_entries *entries)
+{
+    for (size_t i = 0; i < entries->len; i++) {
+        free(entries->items[i].name);
+    }
+    free(entries->items);
+}
+
+/*
+ * Abre el directorio sin el GIL. Devuelve NULL si no se pudo abrir (permisos
+ * denegados, etc.) o si su mtime coincide con 'cached_mtime'. Si 'mtime' no es
+ * NULL, guarda en él el mtime (fstat sobre el descriptor abierto) y en
+ * 'mtime_state' uno de los valores MTIME_*.
+ */
+static DIR *
+open_dir(const char *dir_path, const long long *cached_mtime, long long *mtime, int *mtime_state)
+{
+    if (mtime_state != NULL) {
+        *mtime_state = MTIME_NONE;
+    }
+    DIR *dir = opendir(dir_path);
+    if (dir == NULL || mtime == NULL) {
+        return dir;
+    }
+    struct stat st;
+    if (fstat(dirfd(dir), &st) == 0) {
+        *mtime = ST_MTIME_NS(st);
+        if (cached_mtime != NULL && *cached_mtime == *mtime) {
+            *mtime_state = MTIME_UNCHANGED;
+            closedir(dir);
+            return NULL;
+        }
+        *mtime_state = MTIME_READ;
+    }
+    return dir;
+}
+
+/* Fase 1, sin el GIL: guarda nombre y tipo de cada entrada. Devuelve -1 si falta memoria. */
+static int
+list_dir(DIR *dir, scan_entries *entries)
+{
+    struct dirent *ent;
+    while ((ent = readdir(dir)) != NULL) {
+        const char *name = ent->d_name;
+        if (name[0] == '.' && (name[1] == '\0' || (name[1] == '.' && name[2] == '\0'))) {
+            continue;
+        }
+
+        int kind;
+        if (ent->d_type == DT_DIR) {
+            kind = KIND_DIR;
+        }
+        else if (ent->d_type == DT_REG) {
+            kind = KIND_FILE;
+        }
+        else if (ent->d_type == DT_UNKNOWN) {
+            kind = KIND_UNKNOWN;
+        }
+        else {
+            /* Enlaces simbólicos, sockets, etc. no se siguen */
+            continue;
+        }
+        if (entries_push(entries, name, kind) != 0) {
+            return -1;
+        }
+    }
+    return 0;
+}
+
+/* Llama a 'accept_name' con el nombre de una entrada. Devuelve 1, 0 o -1 (error). */
+static int
+accept_entry(PyObject *accept_name, const char *raw_name)
+{
+    PyObject *name = PyUnicode_DecodeFSDefault(raw_name);
+    if (name == NULL) {
+        return -1;
+    }
+    PyObject *accepted = PyObject_CallOneArg(accept_name, name);
+    Py_DECREF(name);
+    int is_accepted = accepted == NULL ? -1 : PyObject_IsTrue(accepted);
+    Py_XDECREF(accepted);
+    return is_accepted;
+}
+
+/* Fase 2, con el GIL: descarta por nombre los archivos DT_REG. Devuelve -1 si hay error. */
+static int
+filter_names(scan_entries *entries, PyObject *accept_name)
+{
+    for (size_t i = 0; i < entries->len; i++) {
+        scan_entry *item = &entries->items[i];
+        if (item->kind != KIND_FILE) {
+            continue;
+        }
+        int is_accepted = accept_entry(accept_name, item->name);
+        if (is_accepted < 0) {
+            return -1;
+        }
+        item->kind = is_accepted ? KIND_FILE : KIND_SKIP;
+        item->checked = 1;
+    }
+    return 0;
+}
+
+/* Fase 3, sin el GIL: fstatat de los archivos aceptados y de los DT_UNKNOWN. */
+static void
+stat_entries(DIR *dir, scan_entries *entries, long long min_size)
+{
+    int fd = dirfd(dir);
+    struct stat st;
+    for (size_t i = 0; i < entries->len; i++) {
+        scan_entry *item = &entries->items[i];
+        if (item->kind != KIND_FILE && item->kind != KIND_UNKNOWN) {
+            continue;
+        }
+        if (fstatat(fd, item->name, &st, AT_SYMLINK_NOFOLLOW) != 0) {
+            /* Ignorar errores de acceso (permisos denegados, etc.) */
+            item->kind = KIND_SKIP;
+        }
+        else if (S_ISDIR(st.st_mode)) {
+            item->kind = KIND_DIR;
+        }
+        else if (S_ISREG(st.st_mode) && (long long)st.st_size >= min_size) {
+            item->kind = KIND_FILE;
+            item->size = (long long)st.st_size;
+        }
+        else {
+            item->kind = KIND_SKIP;
+        }
+    }
+}
+
+/* Convierte las entradas leídas en (subdirs, files). Devuelve NULL si hay error. */
+static PyObject *
+build_lists(PyObject *dir_path, PyObject *excluded_dirs, PyObject *accept_name,
+            const scan_entries *entries)
+{
+    PyObject *subdirs = NULL, *files = NULL, *parent = NULL, *result = NULL;
+
+    /* Equivalente a os.path.join(dir_path, '') */
+    Py_ssize_t path_len = PyUnicode_GET_LENGTH(dir_path);
+    if (path_len > 0 && PyUnicode_READ_CHAR(dir_path, path_len - 1) == '/') {
+        Py_INCREF(dir_path);
+        parent = dir_path;
+    }
+    else {
+        parent = PyUnicode_FromFormat("%U/", dir_path);
+    }
+    subdirs = PyList_New(0);
+    files = PyList_New(0);
+    if (parent == NULL || subdirs == NULL || files == NULL) {
+        goto done;
+    }
+
+    for (size_t i = 0; i < entries->len; i++) {
+        const scan_entry *item = &entries->items[i];
+        if (item->kind == KIND_SKIP) {
+            continue;
+        }
+        if (item->kind == KIND_FILE && !item->checked && accept_name != Py_None) {
+            /* Los DT_UNKNOWN no se pudieron filtrar antes del fstatat */
+            int is_accepted = accept_entry(accept_name, item->name);
+            if (is_accepted < 0) {
+                goto done;
+            }
+            if (!is_accepted) {
+                continue;
+            }
+        }
+
+        PyObject *name = PyUnicode_DecodeFSDefault(item->name);
+        if (name == NULL) {
+            goto done;
+        }
+        int ok;
+        if (item->kind == KIND_DIR) {
+            /* Filtrar los directorios excluidos */
+            int excluded = PySequence_Contains(excluded_dirs, name);
+            if (excluded < 0) {
+                Py_DECREF(name);
+                goto done;
+            }
+            ok = 0;
+            if (!excluded) {
+                PyObject *path = PyUnicode_Concat(parent, name);
+                ok = path == NULL ? -1 : PyList_Append(subdirs, path);
+                Py_XDECREF(path);
+            }
+        }
+        else {
+            PyObject *path = PyUnicode_Concat(parent, name);
+            PyObject *file = path == NULL ? NULL : Py_BuildValue("(LN)", item->size, path);
+            ok = file == NULL ? -1 : PyList_Append(files, file);
+            Py_XDECREF(file);
+        }
+        Py_DECREF(name);
+        if (ok < 0) {
+            goto done;
+        }
+    }
+    result = PyTuple_Pack(2, subdirs, files);
+
+done:
+    Py_XDECREF(parent);
+    Py_XDECREF(subdirs);
+    Py_XDECREF(files);
+    return result;
+}
+
+/*
+ * Lee un directorio con las tres fases y devuelve (subdirs, files).
+ * Si 'mtime' no es NULL se rellenan 'mtime' y 'mtime_state' (ver open_dir);
+ * con MTIME_UNCHANGED devuelve Py_None (nueva referencia) sin leer nada.
+ */
+static PyObject *
+scan(PyObject *dir_path, PyObject *excluded_dirs, long long min_size, PyObject *accept_name,
+     const long long *cached_mtime, long long *mtime, int *mtime_state)
+{
+    PyObject *dir_bytes = NULL;
+    if (!PyUnicode_FSConverter(dir_path, &dir_bytes)) {
+        return NULL;
+    }
+
+    scan_entries entries = {NULL, 0, 0};
+    int filter = accept_name != Py_None;
+    int status = 0;
+    DIR *dir;
+    Py_BEGIN_ALLOW_THREADS
+    dir = open_dir(PyBytes_AS_STRING(dir_bytes), cached_mtime, mtime, mtime_state);
+    if (dir != NULL) {
+        status = list_dir(dir, &entries);
+        if (status == 0 && !filter) {
+            stat_entries(dir, &entries, min_size);
+        }
+    }
+    Py_END_ALLOW_THREADS
+    Py_DECREF(dir_bytes);
+
+    PyObject *result = NULL;
+    if (status != 0) {
+        PyErr_NoMemory();
+        goto done;
+    }
+    if (dir != NULL && filter) {
+        if (filter_names(&entries, accept_name) != 0) {
+            goto done;
+        }
+        Py_BEGIN_ALLOW_THREADS
+        stat_entries(dir, &entries, min_size);
+        Py_END_ALLOW_THREADS
+    }
+
+    if (mtime_state != NULL && *mtime_state == MTIME_UNCHANGED) {
+        Py_INCREF(Py_None);
+        result = Py_None;
+    }
+    else {
+        result = build_lists(dir_path, excluded_dirs, accept_name, &entries);
+    }
+
+done:
+    if (dir != NULL) {
+        closedir(dir);
+    }
+    entries_free(&entries);
+    return result;
+}
+
+static PyObject *
+fastscan_scan_dir(PyObject *self, PyObject *args)
+{
+    PyObject *dir_path;
+    PyObject *excluded_dirs;
+    long long min_size;
+    PyObject *accept_name = Py_None;
+    if (!PyArg_ParseTuple(args, "UOL|O:scan_dir", &dir_path, &excluded_dirs, &min_size,
+                          &accept_name)) {
+        return NULL;
+    }
+    return scan(dir_path, excluded_dirs, min_size, accept_name, NULL, NULL, NULL);
+}
+
+static PyObject *
+fastscan_scan_dir_cached(PyObject *self, PyObject *args)
+{
+    PyObject *dir_path;
+    PyObject *excluded_dirs;
+    long long min_size;
+    PyObject *accept_name;
+    PyObject *cached_obj;
+    if (!PyArg_ParseTuple(args, "UOLOO:scan_dir_cached", &dir_path, &excluded_dirs, &min_size,
+                          &accept_name, &cached_obj)) {
+        return NULL;
+    }
+
+    long long cached_mtime = 0;
+    if (cached_obj != Py_None) {
+        cached_mtime = PyLong_AsLongLong(cached_obj);
+        if (cached_mtime == -1 && PyErr_Occurred()) {
+            return NULL;
+        }
+    }
+
+    long long mtime = 0;
+    int mtime_state;
+    PyObject *lists = scan(dir_path, excluded_dirs, min_size, accept_name,
+                           cached_obj != Py_None ? &cached_mtime : NULL, &mtime, &mtime_state);
+    if (lists == NULL) {
+        return NULL;
+    }
+
+    PyObject *result;
+    if (mtime_state == MTIME_UNCHANGED) {
+        result = Py_BuildValue("(LOO)", mtime, Py_None, Py_None);
+    }
+    else if (mtime_state == MTIME_READ) {
+        result = Py_BuildValue("(LOO)", mtime, PyTuple_GET_ITEM(lists, 0), PyTuple_GET_ITEM(lists, 1));
+    }
+    else {
+        result = Py_BuildValue("(OOO)", Py_None, PyTuple_GET_ITEM(lists, 0), PyTuple_GET_ITEM(lists, 1));
+    }
+    Py_DECREF(lists);
+    return result;
+}
+
+static PyMethodDef fastscan_methods[] = {
+    {"scan_dir", fastscan_scan_dir, METH_VARARGS,
+     "scan_dir(dir_path, excluded_dirs, min_size_bytes, accept_name=None) -> (subdirs, files)"},
+    {"scan_dir_cached", fastscan_scan_dir_cached, METH_VARARGS,
+     "scan_dir_cached(dir_path, excluded_dirs, min_size_bytes, accept_name, cached_mtime)"
+     " -> (mtime_ns, subdirs, files)"},
+    {NULL, NULL, 0, NULL}
+};
+
+static struct PyModuleDef fastscan_module = {
+    PyModuleDef_HEAD_INIT,
+    "_fastscan",
+    "Lectura de directorios en C (opendir/readdir/fstatat) sin el GIL.",
+    -1,
+    fastscan_methods
+};
+
+PyMODINIT_FUNC
+PyInit__fastscan(void)
+{
+    return PyModule_Create(&fastscan_module);
+}
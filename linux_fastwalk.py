@@ -0,0 +1,270 @@
+"""
+Lectura de directorios en Linux con getdents64 + statx (vía ctypes).
+
+getdents64 ya trae el tipo de cada entrada (d_type), así que los directorios y
+archivos se distinguen sin ningún stat. Solo para los archivos regulares (o
+DT_UNKNOWN en sistemas de archivos que no rellenan d_type) se llama a statx con
+AT_STATX_DONT_SYNC y la máscara mínima, relativo al descriptor del directorio.
+
+Con SEARCH_FILES_IO_URING=1 y el paquete 'liburing' instalado (pip install liburing),
+los statx de cada directorio se envían en lote por io_uring: el kernel los atiende
+a la vez y se espera una sola vez por lote en lugar de una llamada al sistema por
+archivo. Es opcional porque en las mediciones con /usr resultó más lento
+(0.72 s frente a 0.50 s con statx síncrono).
+
+main.py solo usa este módulo si se define SEARCH_FILES_LINUX_FASTWALK=1: con la
+caché de páginas caliente es más lento que os.scandir (mismo número de stat, pero
+los dirents se analizan en Python).
+
+Requiere glibc >= 2.30 (exporta getdents64 y statx); si no, importar este
+módulo lanza ImportError y main.py sigue usando os.scandir.
+"""
+import atexit
+import ctypes
+import ctypes.util
+import os
+import queue
+import stat
+import struct
+
+liburing = None
+if os.environ.get('SEARCH_FILES_IO_URING') == '1':
+    try:
+        import liburing
+    except ImportError:
+        pass
+# Se desactiva si el kernel no permite io_uring (sin perder 'liburing' para liberar los anillos)
+_use_uring = liburing is not None
+
+DT_UNKNOWN = 0
+DT_DIR = 4
+DT_REG = 8
+
+AT_SYMLINK_NOFOLLOW = 0x100
+AT_STATX_DONT_SYNC = 0x4000
+
+STATX_TYPE = 0x1
+STATX_SIZE = 0x200
+
+# struct statx: stx_mode (u16) en el byte 28, stx_size (u64) en el byte 40
+_STATX_BUF_SIZE = 256
+_STATX_MODE = struct.Struct('=H')
+_STATX_MODE_OFFSET = 28
+_STATX_SIZE = struct.Struct('=Q')
+_STATX_SIZE_OFFSET = 40
+
+# struct linux_dirent64: d_ino (u64), d_off (s64), d_reclen (u16), d_type (u8), d_name[]
+_DIRENT_HEADER = struct.Struct('=QqHB')
+
+_GETDENTS_BUF_SIZE = 64 * 1024
+
+# Entradas de cada anillo de io_uring (máximo de statx en vuelo por lote)
+_URING_ENTRIES = 256
+# Anillos libres, reutilizados entre hilos y entre recorridos
+_rings = queue.SimpleQueue()
+
+_libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+try:
+    _getdents64 = _libc.getdents64
+    _statx = _libc.statx
+except AttributeError as e:
+    raise ImportError(f"libc no exporta getdents64/statx: {e}") from e
+
+_getdents64.argtypes = [ctypes.c_int, ctypes.c_void_p, ctypes.c_size_t]
+_getdents64.restype = ctypes.c_ssize_t
+
+_statx.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_int, ctypes.c_uint, ctypes.c_void_p]
+_statx.restype = ctypes.c_int
+
+
+def _statx_mask(d_type):
+    # Para DT_REG basta el tamaño; para DT_UNKNOWN también hace falta el tipo
+    return STATX_SIZE if d_type == DT_REG else STATX_TYPE | STATX_SIZE
+
+
+def _statx_sync(fd, pending):
+    """
+    Llama a statx una vez por entrada de 'pending' (lista de (nombre, d_type)).
+    Devuelve una lista paralela con (st_mode, tamaño), o None si la llamada falló.
+    """
+    stx = ctypes.create_string_buffer(_STATX_BUF_SIZE)
+    results = []
+    for raw_name, d_type in pending:
+        if _statx(fd, raw_name, AT_STATX_DONT_SYNC | AT_SYMLINK_NOFOLLOW, _statx_mask(d_type), stx) != 0:
+            # Ignorar errores de acceso (permisos denegados, etc.)
+            results.append(None)
+        else:
+            results.append((_STATX_MODE.unpack_from(stx, _STATX_MODE_OFFSET)[0],
+                            _STATX_SIZE.unpack_from(stx, _STATX_SIZE_OFFSET)[0]))
+    return results
+
+
+def _statx_uring(fd, pending):
+    """
+    Igual que _statx_sync, pero envía los statx por io_uring en lotes de hasta
+    _URING_ENTRIES y espera cada lote con una sola llamada.
+    """
+    try:
+        ring, cqe = _rings.get_nowait()
+    except queue.Empty:
+        ring, cqe = liburing.Ring(), liburing.Cqe()
+        liburing.io_uring_queue_init(_URING_ENTRIES, ring)
+
+    results = [None] * len(pending)
+    try:
+        for start in range(0, len(pending), _URING_ENTRIES):
+            batch = pending[start:start + _URING_ENTRIES]
+            # Los nombres y los buffers deben seguir vivos hasta que el kernel complete cada statx
+            names = [os.fsdecode(raw_name) for raw_name, _ in batch]
+            buffers = []
+            for i, (name, (_, d_type)) in enumerate(zip(names, batch), start):
+                stx = liburing.Statx()
+                buffers.append(stx)
+                sqe = liburing.io_uring_get_sqe(ring)
+                liburing.io_uring_prep_statx(sqe, stx, name,
+                                             AT_STATX_DONT_SYNC | AT_SYMLINK_NOFOLLOW,
+                                             _statx_mask(d_type), fd)
+                liburing.io_uring_sqe_set_data64(sqe, i)
+            # Vuelve cuando todo el lote está completado (la cola de completados es el doble de grande)
+            liburing.io_uring_submit_and_wait(ring, len(batch))
+
+            completed = 0
+            cqe_iter = liburing.io_uring_cqe_iter_init(ring)
+            while liburing.io_uring_cqe_iter_next(cqe_iter, cqe):
+                entry = cqe[0]
+                completed += 1
+                i = entry.user_data
+                try:
+                    entry.res # Lanza OSError si el statx falló
+                except OSError:
+                    # Ignorar errores de acceso (permisos denegados, etc.)
+                    continue
+                stx = buffers[i - start]
+                results[i] = (stx.mode, stx.size)
+            liburing.io_uring_cq_advance(ring, completed)
+    finally:
+        _rings.put((ring, cqe))
+    return results
+
+
+@atexit.register
+def _close_rings():
+    # Libera los anillos de io_uring creados durante la ejecución
+    while True:
+        try:
+            ring, _ = _rings.get_nowait()
+        except queue.Empty:
+            break
+        liburing.io_uring_queue_exit(ring)
+
+
+def _statx_many(fd, pending):
+    """
+    Resuelve (st_mode, tamaño) de las entradas de 'pending', por io_uring si
+    se activó y está disponible y, si no (o si el kernel no lo permite), con statx síncrono.
+    """
+    global _use_uring
+    if _use_uring and pending:
+        try:
+            return _statx_uring(fd, pending)
+        except OSError:
+            # io_uring deshabilitado en este kernel/contenedor: no volver a intentarlo
+            _use_uring = False
+    return _statx_sync(fd, pending)
+
+
+def _add_subdir(subdirs, parent, raw_name, excluded_dirs):
+    name = os.fsdecode(raw_name)
+    # Filtrar los directorios excluidos
+    if name not in excluded_dirs:
+        subdirs.append(parent + name)
+
+
+def _read_dir(fd, parent, excluded_dirs, min_size_bytes, accept_name,
+              _unpack_header=_DIRENT_HEADER.unpack_from, _header_size=_DIRENT_HEADER.size):
+    """
+    Lee el directorio abierto en 'fd' con getdents64/statx y devuelve
+    (subdirectorios, archivos). 'parent' es la ruta del directorio con separador final.
+    """
+    subdirs = []
+    files = []
+    buf = ctypes.create_string_buffer(_GETDENTS_BUF_SIZE)
+    pending = [] # (nombre, d_type) de las entradas que necesitan statx
+    add_pending = pending.append
+    while True:
+        nread = _getdents64(fd, buf, _GETDENTS_BUF_SIZE)
+        if nread <= 0:
+            # 0: fin del directorio; -1: error de lectura, se ignora
+            break
+        data = ctypes.string_at(buf, nread)
+        offset = 0
+        while offset < nread:
+            _, _, reclen, d_type = _unpack_header(data, offset)
+            name_start = offset + _header_size
+            raw_name = data[name_start:data.index(b'\0', name_start)]
+            offset += reclen
+            if raw_name in (b'.', b'..') or d_type not in (DT_DIR, DT_REG, DT_UNKNOWN):
+                continue
+
+            if d_type == DT_DIR:
+                _add_subdir(subdirs, parent, raw_name, excluded_dirs)
+            elif (d_type == DT_UNKNOWN or accept_name is None
+                  or accept_name(os.fsdecode(raw_name))):
+                add_pending((raw_name, d_type))
+
+    # Los statx del directorio se resuelven juntos (en lote si hay io_uring)
+    for (raw_name, d_type), result in zip(pending, _statx_many(fd, pending)):
+        if result is None:
+            continue
+        mode, size = result
+        if d_type == DT_UNKNOWN and stat.S_ISDIR(mode):
+            _add_subdir(subdirs, parent, raw_name, excluded_dirs)
+        elif (d_type == DT_REG or stat.S_ISREG(mode)) and size >= min_size_bytes:
+            name = os.fsdecode(raw_name)
+            # Los DT_UNKNOWN no se pudieron filtrar antes del statx
+            if d_type == DT_REG or accept_name is None or accept_name(name):
+                files.append((size, parent + name))
+    return subdirs, files
+
+
+def scan_dir(dir_path, excluded_dirs, min_size_bytes, accept_name=None):
+    """
+    Equivalente a main._scan_dir usando getdents64/statx: devuelve
+    (subdirectorios, archivos), donde 'archivos' son tuplas (tamaño, ruta)
+    mayores o iguales a 'min_size_bytes'. Los enlaces simbólicos no se siguen.
+    Con 'accept_name', los archivos DT_REG que no acepta se descartan antes del statx.
+    """
+    try:
+        fd = os.open(dir_path, os.O_RDONLY | os.O_DIRECTORY | os.O_CLOEXEC)
+    except OSError:
+        # No se pudo abrir el directorio (permisos denegados, etc.)
+        return [], []
+
+    # Prefijo con separador final, calculado una vez por directorio: cada hijo es 'parent + nombre'
+    parent = dir_path if dir_path.endswith(os.sep) else dir_path + os.sep
+    try:
+        return _read_dir(fd, parent, excluded_dirs, min_size_bytes, accept_name)
+    finally:
+        os.close(fd)
+
+
+def scan_dir_cached(dir_path, excluded_dirs, min_size_bytes, accept_name, cached_mtime):
+    """
+    Equivalente a main._scan_dir_cached: devuelve (mtime_ns, subdirectorios, archivos),
+    con el mtime tomado con fstat del descriptor ya abierto. Si coincide con
+    'cached_mtime', el directorio no se lee y se devuelve (mtime_ns, None, None).
+    """
+    try:
+        fd = os.open(dir_path, os.O_RDONLY | os.O_DIRECTORY | os.O_CLOEXEC)
+    except OSError:
+        # No se pudo abrir el directorio (permisos denegados, etc.)
+        return None, [], []
+
+    try:
+        mtime = os.fstat(fd).st_mtime_ns
+        if mtime == cached_mtime:
+            return mtime, None, None
+        parent = dir_path if dir_path.endswith(os.sep) else dir_path + os.sep
+        return (mtime,) + _read_dir(fd, parent, excluded_dirs, min_size_bytes, accept_name)
+    finally:
+        os.close(fd)
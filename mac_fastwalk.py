@@ -0,0 +1,134 @@
+"""
+Lectura de directorios en macOS con getattrlistbulk (vía ctypes).
+
+getattrlistbulk(2) devuelve el nombre, el tipo y el tamaño de muchas entradas
+en una sola llamada al sistema, en lugar de un stat por archivo.
+"""
+import ctypes
+import os
+import struct
+
+ATTR_BIT_MAP_COUNT = 5
+
+ATTR_CMN_NAME = 0x00000001
+ATTR_CMN_OBJTYPE = 0x00000008
+ATTR_CMN_RETURNED_ATTRS = 0x80000000
+ATTR_FILE_TOTALSIZE = 0x00000002
+
+# Valores de fsobj_type_t
+VREG = 1
+VDIR = 2
+
+# Cada entrada del buffer: length (u32), attribute_set_t (5 x u32),
+# attrreference_t del nombre (s32 offset, u32 longitud), objtype (u32)
+# y, solo si se devolvió, ATTR_FILE_TOTALSIZE (off_t)
+_ENTRY_HEADER = struct.Struct('=I5IiII')
+_NAME_REF_OFFSET = 24
+_TOTALSIZE = struct.Struct('=q')
+
+_BULK_BUF_SIZE = 64 * 1024
+
+
+class _AttrList(ctypes.Structure):
+    _fields_ = [
+        ('bitmapcount', ctypes.c_ushort),
+        ('reserved', ctypes.c_uint16),
+        ('commonattr', ctypes.c_uint32),
+        ('volattr', ctypes.c_uint32),
+        ('dirattr', ctypes.c_uint32),
+        ('fileattr', ctypes.c_uint32),
+        ('forkattr', ctypes.c_uint32),
+    ]
+
+
+_libc = ctypes.CDLL('libc.dylib', use_errno=True)
+_getattrlistbulk = _libc.getattrlistbulk
+_getattrlistbulk.argtypes = [ctypes.c_int, ctypes.POINTER(_AttrList), ctypes.c_void_p,
+                             ctypes.c_size_t, ctypes.c_uint64]
+_getattrlistbulk.restype = ctypes.c_int
+
+_ATTR_LIST = _AttrList(
+    bitmapcount=ATTR_BIT_MAP_COUNT,
+    commonattr=ATTR_CMN_NAME | ATTR_CMN_OBJTYPE | ATTR_CMN_RETURNED_ATTRS,
+    fileattr=ATTR_FILE_TOTALSIZE,
+)
+
+
+def _read_dir(fd, parent, excluded_dirs, min_size_bytes, accept_name):
+    """
+    Lee el directorio abierto en 'fd' con getattrlistbulk y devuelve
+    (subdirectorios, archivos). 'parent' es la ruta del directorio con separador final.
+    """
+    subdirs = []
+    files = []
+    buf = ctypes.create_string_buffer(_BULK_BUF_SIZE)
+    while True:
+        count = _getattrlistbulk(fd, ctypes.byref(_ATTR_LIST), buf, _BULK_BUF_SIZE, 0)
+        if count <= 0:
+            # 0: fin del directorio; -1: error de lectura, se ignora
+            break
+        data = buf.raw
+        offset = 0
+        for _ in range(count):
+            (length, _, _, _, returned_fileattr, _,
+             name_offset, name_length, obj_type) = _ENTRY_HEADER.unpack_from(data, offset)
+            name_start = offset + _NAME_REF_OFFSET + name_offset
+            # name_length incluye el NUL final
+            raw_name = data[name_start:name_start + name_length - 1]
+
+            if obj_type == VDIR:
+                name = os.fsdecode(raw_name)
+                # Filtrar los directorios excluidos
+                if name not in excluded_dirs:
+                    subdirs.append(parent + name)
+            elif obj_type == VREG and returned_fileattr & ATTR_FILE_TOTALSIZE:
+                size = _TOTALSIZE.unpack_from(data, offset + _ENTRY_HEADER.size)[0]
+                if size >= min_size_bytes:
+                    name = os.fsdecode(raw_name)
+                    if accept_name is None or accept_name(name):
+                        files.append((size, parent + name))
+            offset += length
+    return subdirs, files
+
+
+def scan_dir(dir_path, excluded_dirs, min_size_bytes, accept_name=None):
+    """
+    Equivalente a main._scan_dir usando getattrlistbulk: devuelve
+    (subdirectorios, archivos), donde 'archivos' son tuplas (tamaño, ruta)
+    mayores o iguales a 'min_size_bytes' y aceptados por 'accept_name' (si hay).
+    Los enlaces simbólicos no se siguen.
+    """
+    try:
+        fd = os.open(dir_path, os.O_RDONLY | os.O_DIRECTORY)
+    except OSError:
+        # No se pudo abrir el directorio (permisos denegados, etc.)
+        return [], []
+
+    # Prefijo con separador final, calculado una vez por directorio: cada hijo es 'parent + nombre'
+    parent = dir_path if dir_path.endswith(os.sep) else dir_path + os.sep
+    try:
+        return _read_dir(fd, parent, excluded_dirs, min_size_bytes, accept_name)
+    finally:
+        os.close(fd)
+
+
+def scan_dir_cached(dir_path, excluded_dirs, min_size_bytes, accept_name, cached_mtime):
+    """
+    Equivalente a main._scan_dir_cached: devuelve (mtime_ns, subdirectorios, archivos),
+    con el mtime tomado con fstat del descriptor ya abierto. Si coincide con
+    'cached_mtime', el directorio no se lee y se devuelve (mtime_ns, None, None).
+    """
+    try:
+        fd = os.open(dir_path, os.O_RDONLY | os.O_DIRECTORY)
+    except OSError:
+        # No se pudo abrir el directorio (permisos denegados, etc.)
+        return None, [], []
+
+    try:
+        mtime = os.fstat(fd).st_mtime_ns
+        if mtime == cached_mtime:
+            return mtime, None, None
+        parent = dir_path if dir_path.endswith(os.sep) else dir_path + os.sep
+        return (mtime,) + _read_dir(fd, parent, excluded_dirs, min_size_bytes, accept_name)
+    finally:
+        os.close(fd)
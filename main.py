@@ -1,35 +1,100 @@
+import argparse
+import heapq
+import json
+import math
 import os
+import sys
+from collections import deque
+from contextlib import nullcontext
+from operator import itemgetter
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from tqdm import tqdm
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 
-def gestionar_csv_cambios(df_nueva_ejecucion, control_changes_file):
+# Puedes añadir más nombres de subcarpetas si encuentras otras que no quieres escanear
+EXCLUDED_DIRS = frozenset({
+    'System Volume Information',
+    '$Recycle.Bin',
+    'Windows',
+    'Recovery',
+    'PerfLogs',
+    'Drivers',
+    'Config.Msi',
+    'MSOCache',
+})
+
+# Hilos para recorrer directorios en paralelo (el trabajo es de E/S, no de CPU)
+SCAN_WORKERS = 16
+# Solo se reparten entre hilos los subdirectorios de carpetas con más de este número de ellos
+PARALLEL_MIN_SUBDIRS = 4
+# La barra de progreso se actualiza en lotes de al menos este número de directorios
+PBAR_BATCH = 128
+
+# Unidades de tamaño en bytes
+_MB = 1 << 20
+_GB = 1 << 30
+
+
+def _escribir_parquet(df, control_changes_file):
+    """
+    Escribe el DataFrame en Parquet (comprimido con zstd) con el escritor vectorizado de pyarrow.
+    """
+    pq.write_table(pa.Table.from_pandas(df, preserve_index=False), control_changes_file,
+                   compression='zstd')
+
+
+def _leer_nombres_existentes(control_changes_file):
+    """
+    Devuelve el conjunto de 'File_Name' del archivo de control, o None si no hay
+    ninguno. Si falta el Parquet pero existe el CSV de versiones anteriores
+    (mismo nombre con extensión .csv), se usa ese CSV como base una sola vez.
     """
-    Gestiona un archivo CSV de control de cambios. Si el archivo no existe,
+    if os.path.exists(control_changes_file):
+        # Parquet es columnar: solo se lee la columna 'File_Name', sin parsear el resto
+        tabla_existente = pq.read_table(control_changes_file, columns=['File_Name'])
+        return set(tabla_existente.column('File_Name').to_pylist())
+
+    csv_anterior = os.path.splitext(control_changes_file)[0] + '.csv'
+    if os.path.exists(csv_anterior):
+        print(f"\nSe usa {csv_anterior} como base (se migra a {control_changes_file})")
+        df_existente = pd.read_csv(csv_anterior, usecols=['File_Name'], encoding='utf-8')
+        return set(df_existente["File_Name"].tolist())
+
+    return None
+
+
+def gestionar_cambios(df_nueva_ejecucion, control_changes_file):
+    """
+    Gestiona un archivo Parquet de control de cambios. Si el archivo no existe,
     lo crea con los datos de la nueva ejecución. Si existe, compara la columna
-    'File_Name' entre el CSV existente y el nuevo DataFrame, e imprime las diferencias.
-    El archivo existente NO se sobrescribe si ya existe.
+    'File_Name' entre el archivo existente y el nuevo DataFrame, e imprime las diferencias.
+    El archivo existente solo se sobrescribe si hay diferencias.
+    Si solo existe el CSV de control de versiones anteriores, se compara contra él
+    y el resultado se guarda en Parquet.
 
     Args:
         df_nueva_ejecucion (pd.DataFrame): El DataFrame con los datos de la nueva ejecución
                                            (debe contener una columna 'File_Name').
-        control_changes_file (str): El nombre del archivo CSV de control.
+        control_changes_file (str): El nombre del archivo Parquet de control.
     """
 
-    # Verificar si el archivo CSV ya existe
-    if not os.path.exists(control_changes_file):
-        # El CSV no existe, entonces lo creo y termino
-        df_nueva_ejecucion.to_csv(control_changes_file, index=False, encoding='utf-8')
+    nombres_en_archivo_existente = _leer_nombres_existentes(control_changes_file)
 
-    else:
-        # El CSV SÍ existe, entonces lo leo y comparo
-        df_existente = pd.read_csv(control_changes_file)
+    # Verificar si el archivo de control ya existe
+    if nombres_en_archivo_existente is None:
+        # El archivo no existe, entonces lo creo y termino
+        _escribir_parquet(df_nueva_ejecucion, control_changes_file)
 
+    else:
+        # El archivo SÍ existe, entonces comparo
         # Obtener los conjuntos de nombres de archivo para una comparación eficiente
-        nombres_en_csv_existente = set(df_existente["File_Name"].tolist())
         nombres_en_nueva_ejecucion = set(df_nueva_ejecucion["File_Name"].tolist())
 
-        # Nombres nuevos: los que están en la nueva ejecución pero no en el CSV
-        archivos_nuevos = nombres_en_nueva_ejecucion - nombres_en_csv_existente
+        # Nombres nuevos: los que están en la nueva ejecución pero no en el archivo
+        archivos_nuevos = nombres_en_nueva_ejecucion - nombres_en_archivo_existente
         if archivos_nuevos:
             print(f"\nArchivos NUEVOS")
             print("-" * 50) # Línea separadora
@@ -37,8 +102,8 @@ def gestionar_csv_cambios(df_nueva_ejecucion, control_changes_file):
                 print(f"- {new_files}")
             print("-" * 50, end='\n') # Línea separadora
 
-        # Nombres que ya no están: los que estaban en el CSV pero no en la nueva ejecución
-        archivos_eliminados = nombres_en_csv_existente - nombres_en_nueva_ejecucion
+        # Nombres que ya no están: los que estaban en el archivo pero no en la nueva ejecución
+        archivos_eliminados = nombres_en_archivo_existente - nombres_en_nueva_ejecucion
         if archivos_eliminados:
             print(f"\nArchivos ELIMINADOS")
             print("-" * 50) # Línea separadora
@@ -48,109 +113,438 @@ def gestionar_csv_cambios(df_nueva_ejecucion, control_changes_file):
 
         if archivos_nuevos or archivos_eliminados:
             print('\nSE ACTUALIZO LA BASE DE DATOS')
-            df_nueva_ejecucion.to_csv(control_changes_file, index=False, encoding='utf-8')
+            _escribir_parquet(df_nueva_ejecucion, control_changes_file)
         else:
             print('\nNO SE ACTUALIZO LA BASE DE DATOS')
+            if not os.path.exists(control_changes_file):
+                # Sin cambios respecto al CSV anterior: igualmente se crea el Parquet
+                _escribir_parquet(df_nueva_ejecucion, control_changes_file)
+
+
+# Nombre anterior, se mantiene por compatibilidad con quien lo importe
+gestionar_csv_cambios = gestionar_cambios
 
 
-def find_large_files_in_paths(paths_to_scan, min_size_mb=100):
+def _leer_directorio(target, parent, excluded_dirs, min_size_bytes, accept_name, _scandir=os.scandir):
     """
-    Busca archivos mayores a 'min_size_mb' en las rutas proporcionadas.
+    Bucle común de _scan_dir y _scan_dir_cached: lee 'target' (ruta o descriptor)
+    con os.scandir y devuelve (subdirectorios, archivos), donde 'archivos' son tuplas
+    (tamaño, ruta) mayores o iguales a 'min_size_bytes'. Cada ruta es 'parent + entry.path'
+    (con un descriptor, entry.path es solo el nombre).
+    Usa la información de DirEntry para no hacer llamadas stat adicionales por archivo.
+    Si hay 'accept_name' (ver _crear_filtro_extensiones), los archivos cuyo nombre
+    no acepta se descartan antes de pedir su tamaño.
+    Los nombres usados en el bucle por entrada son variables locales (LOAD_FAST).
+    """
+    subdirs = []
+    files = []
+    add_subdir = subdirs.append
+    add_file = files.append
+    try:
+        with _scandir(target) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        # Filtrar los directorios excluidos
+                        if entry.name not in excluded_dirs:
+                            add_subdir(parent + entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        if accept_name is not None and not accept_name(entry.name):
+                            continue
+                        size = entry.stat(follow_symlinks=False).st_size
+                        if size >= min_size_bytes:
+                            add_file((size, parent + entry.path))
+                except OSError:
+                    # Ignorar errores de acceso (permisos denegados, etc.)
+                    pass
+    except OSError:
+        # No se pudo abrir el directorio (permisos denegados, etc.)
+        pass
+    return subdirs, files
+
+
+def _scan_dir(dir_path, excluded_dirs, min_size_bytes, accept_name=None):
+    """
+    Lee un único directorio con os.scandir y devuelve (subdirectorios, archivos),
+    donde 'archivos' son tuplas (tamaño, ruta) mayores o iguales a 'min_size_bytes'.
     """
-    min_size_bytes = min_size_mb * (1024**2) # Convierte MB a Bytes
-    large_files = [] # Lista de archivos
-
-    # Puedes añadir más nombres de subcarpetas si encuentras otras que no quieres escanear
-    excluded_dirs = [
-        'System Volume Information',
-        '$Recycle.Bin',
-        'Windows',
-        'Recovery',
-        'PerfLogs',
-        'Drivers',
-        'Config.Msi',
-        'MSOCache',
+    return _leer_directorio(dir_path, '', excluded_dirs, min_size_bytes, accept_name)
+
+
+def _scan_dir_cached(dir_path, excluded_dirs, min_size_bytes, accept_name, cached_mtime):
+    """
+    Igual que _scan_dir, pero para la caché: devuelve (mtime_ns, subdirectorios, archivos).
+    El mtime se obtiene con fstat sobre el descriptor ya abierto para leer el directorio;
+    si coincide con 'cached_mtime' no se lee y se devuelve (mtime_ns, None, None).
+    Si el directorio no se puede abrir, el mtime es None.
+    """
+    try:
+        fd = os.open(dir_path, os.O_RDONLY | os.O_DIRECTORY)
+    except OSError:
+        # No se pudo abrir el directorio (permisos denegados, etc.)
+        return None, [], []
+    try:
+        mtime = os.fstat(fd).st_mtime_ns
+        if mtime == cached_mtime:
+            return mtime, None, None
+        # Prefijo con separador final: con un descriptor, os.scandir solo da el nombre
+        parent = dir_path if dir_path.endswith(os.sep) else dir_path + os.sep
+        subdirs, files = _leer_directorio(fd, parent, excluded_dirs, min_size_bytes, accept_name)
+    finally:
+        os.close(fd)
+    return mtime, subdirs, files
+
+
+# En Windows se usa FindFirstFileExW, que no calcula los nombres cortos 8.3
+# En macOS se usa getattrlistbulk, que trae nombre, tipo y tamaño por lotes
+# En Linux el lector getdents64 + statx es opcional (SEARCH_FILES_LINUX_FASTWALK=1):
+# hace el mismo número de stat que os.scandir pero analiza los dirents en Python,
+# y en las mediciones con /usr resultó más lento, así que por defecto se usa os.scandir
+if sys.platform == 'win32':
+    from win_fastwalk import scan_dir as _scan_dir, scan_dir_cached as _scan_dir_cached
+elif sys.platform == 'darwin':
+    from mac_fastwalk import scan_dir as _scan_dir, scan_dir_cached as _scan_dir_cached
+elif sys.platform.startswith('linux') and os.environ.get('SEARCH_FILES_LINUX_FASTWALK') == '1':
+    try:
+        from linux_fastwalk import scan_dir as _scan_dir, scan_dir_cached as _scan_dir_cached
+    except ImportError:
+        # glibc antigua sin getdents64/statx: se mantiene os.scandir
+        pass
+
+# En Linux, si se compiló la extensión en C (python setup.py build_ext --inplace), tiene
+# prioridad. En macOS no: haría un fstatat por entrada en vez de las llamadas por lotes
+# de getattrlistbulk
+if sys.platform.startswith('linux'):
+    try:
+        from _fastscan import scan_dir as _scan_dir, scan_dir_cached as _scan_dir_cached
+    except ImportError:
+        pass
+
+
+def _cargar_cache(cache_file, excluded_dirs, min_size_bytes, ext_filters):
+    """
+    Carga la caché de directorios de la ejecución anterior como un diccionario
+    {ruta: (mtime_ns, subdirectorios, archivos)}. Si el archivo no existe o se
+    generó con otro tamaño mínimo, otras carpetas excluidas u otros filtros de
+    extensión, devuelve una caché vacía.
+    """
+    if not os.path.exists(cache_file):
+        return {}
+    tabla = pq.read_table(cache_file)
+    metadata = tabla.schema.metadata or {}
+    if (metadata.get(b'min_size_bytes') != str(min_size_bytes).encode()
+            or metadata.get(b'excluded_dirs') != json.dumps(sorted(excluded_dirs)).encode()
+            or metadata.get(b'ext_filters') != json.dumps(ext_filters).encode()):
+        return {}
+    columnas = tabla.to_pydict()
+    return {
+        dir_path: (mtime, subdirs, list(zip(sizes, names)))
+        for dir_path, mtime, subdirs, names, sizes in zip(
+            columnas['Dir_Path'], columnas['Dir_Mtime'], columnas['Subdirs'],
+            columnas['File_Names'], columnas['File_Sizes'])
+    }
+
+
+def _guardar_cache(cache_file, entradas, cache_anterior, raices, excluded_dirs, min_size_bytes,
+                   ext_filters):
+    """
+    Guarda la caché de directorios visitados en esta ejecución. Bajo las rutas
+    recorridas se reescribe completa, así que los directorios que ya no existen
+    desaparecen de ella; las entradas de otras rutas (no incluidas en esta ejecución
+    o que no estaban disponibles) se conservan de la caché anterior.
+
+    Args:
+        entradas (list): Tuplas (ruta, mtime_ns, subdirectorios, archivos).
+        cache_anterior (dict): La caché cargada con _cargar_cache.
+        raices (list): Rutas recorridas en esta ejecución.
+    """
+    prefijos = tuple(raiz if raiz.endswith(os.sep) else raiz + os.sep for raiz in raices)
+    raices = set(raices)
+    conservadas = [
+        (dir_path, mtime, subdirs, files)
+        for dir_path, (mtime, subdirs, files) in cache_anterior.items()
+        if dir_path not in raices and not dir_path.startswith(prefijos)
     ]
+    entradas = conservadas + entradas
+
+    tabla = pa.Table.from_pydict({
+        'Dir_Path': [dir_path for dir_path, _, _, _ in entradas],
+        'Dir_Mtime': pa.array([mtime for _, mtime, _, _ in entradas], type=pa.int64()),
+        'Subdirs': pa.array([subdirs for _, _, subdirs, _ in entradas], type=pa.list_(pa.string())),
+        'File_Names': pa.array([[path for _, path in files] for _, _, _, files in entradas],
+                               type=pa.list_(pa.string())),
+        'File_Sizes': pa.array([[size for size, _ in files] for _, _, _, files in entradas],
+                               type=pa.list_(pa.int64())),
+    }, metadata={
+        'min_size_bytes': str(min_size_bytes),
+        'excluded_dirs': json.dumps(sorted(excluded_dirs)),
+        'ext_filters': json.dumps(ext_filters),
+    })
+    pq.write_table(tabla, cache_file, compression='zstd')
+
+
+def _scan_subtree(root, excluded_dirs, min_size_bytes, accept_name, cache,
+                  _scan_dir=_scan_dir, _scan_dir_cached=_scan_dir_cached,
+                  _min_subdirs=PARALLEL_MIN_SUBDIRS):
+    """
+    Tarea de un hilo del pool: recorre 'root' con una pila explícita (sin recursión).
+    Los directorios con pocos subdirectorios se siguen recorriendo en el mismo hilo;
+    los que tienen más de PARALLEL_MIN_SUBDIRS se devuelven para repartirlos entre los hilos.
+
+    Si hay 'cache', los directorios cuyo mtime no cambió desde la ejecución anterior
+    no se vuelven a leer: se reutilizan sus subdirectorios y archivos guardados.
+    El mtime lo obtiene el propio lector al abrir el directorio (sin un stat aparte).
+    El mtime de un directorio solo cambia al crear, borrar o renombrar entradas,
+    así que un archivo que crece en su sitio no se detecta hasta que su carpeta cambie.
+
+    Los argumentos con '_' fijan como locales la implementación de _scan_dir elegida
+    para la plataforma y las demás globales usadas en cada directorio.
+
+    Returns:
+        tuple: (archivos encontrados, directorios visitados, subdirectorios a repartir,
+                entradas nuevas para la caché)
+    """
+    stack = deque([root])
+    files = []
+    to_dispatch = []
+    cache_entries = []
+    visited = 0
+    while stack:
+        dir_path = stack.pop()
+        if cache is None:
+            subdirs, found = _scan_dir(dir_path, excluded_dirs, min_size_bytes, accept_name)
+        else:
+            cached = cache.get(dir_path)
+            mtime, subdirs, found = _scan_dir_cached(dir_path, excluded_dirs, min_size_bytes,
+                                                     accept_name,
+                                                     cached[0] if cached is not None else None)
+            if subdirs is None:
+                # El directorio no cambió desde la ejecución anterior
+                _, subdirs, found = cached
+            if mtime is not None:
+                cache_entries.append((dir_path, mtime, subdirs, found))
+        files.extend(found)
+        visited += 1
+        if len(subdirs) <= _min_subdirs:
+            stack.extend(subdirs)
+        else:
+            to_dispatch.extend(subdirs)
+    return files, visited, to_dispatch, cache_entries
+
+
+def _scan(root, excluded_dirs, min_size_bytes, pbar, cache=None, new_cache=None, accept_name=None):
+    """
+    Recorre 'root' en paralelo con un ThreadPoolExecutor y devuelve tuplas
+    (tamaño, ruta) de los archivos mayores o iguales a 'min_size_bytes'.
+    El recorrido está limitado por la latencia de readdir/stat, así que varios
+    hilos mantienen ocupada la cola de E/S del disco.
+    Si 'pbar' es None no se muestra progreso. Si hay 'cache' (ver _cargar_cache),
+    los directorios visitados se añaden a la lista 'new_cache'.
+    """
+    pending_updates = 0 # Directorios visitados aún no reflejados en la barra
+    executor = ThreadPoolExecutor(max_workers=SCAN_WORKERS)
+    pending = {executor.submit(_scan_subtree, root, excluded_dirs, min_size_bytes, accept_name, cache)}
+    try:
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                files, visited, subdirs, cache_entries = future.result()
+                for subdir in subdirs:
+                    pending.add(executor.submit(_scan_subtree, subdir, excluded_dirs, min_size_bytes,
+                                                accept_name, cache))
+                if new_cache is not None:
+                    new_cache.extend(cache_entries)
+                pending_updates += visited
+                if pbar is not None and pending_updates >= PBAR_BATCH:
+                    pbar.update(pending_updates) # Actualiza la barra por lotes de directorios
+                    pending_updates = 0
+                yield from files
+    finally:
+        # Con Ctrl-C, un error o si se deja de consumir el generador, no esperar a que
+        # terminen los subárboles en cola: se cancelan y solo acaban los que ya corren
+        executor.shutdown(wait=False, cancel_futures=True)
+    if pbar is not None and pending_updates:
+        pbar.update(pending_updates)
+
+
+def _normalizar_extensiones(exts):
+    # '.MKV', 'mkv' -> '.mkv'
+    if not exts:
+        return None
+    if isinstance(exts, str):
+        # Una sola extensión ('.iso'), no la secuencia de sus caracteres
+        exts = (exts,)
+    return frozenset(e.lower() if e.startswith('.') else '.' + e.lower() for e in exts)
+
+
+def _crear_filtro_extensiones(include_exts, exclude_exts):
+    """
+    Devuelve una función accept_name(nombre) -> bool que aplica las listas de
+    extensiones permitidas/excluidas, o None si no hay ningún filtro.
+    Es una comparación de cadenas sobre el nombre, así que evita el stat de los descartados.
+    """
+    if include_exts is None and exclude_exts is None:
+        return None
+    # endswith con una tupla: también sirven extensiones compuestas como '.tar.gz'
+    include_suffixes = tuple(include_exts) if include_exts is not None else None
+    exclude_suffixes = tuple(exclude_exts) if exclude_exts is not None else None
+
+    def accept_name(name):
+        name = name.lower()
+        if exclude_suffixes is not None and name.endswith(exclude_suffixes):
+            return False
+        return include_suffixes is None or name.endswith(include_suffixes)
+
+    return accept_name
+
+
+def _deduplicar_rutas(paths_to_scan):
+    """
+    Descarta las rutas repetidas o las que están dentro de otra ruta de la lista,
+    para no recorrer dos veces el mismo árbol. La comparación usa os.path.realpath,
+    pero se devuelven las rutas tal como se configuraron (así no cambian los
+    'File_Name' del histórico ni lo que muestra la barra de progreso).
+    Mantiene el orden original de las rutas conservadas.
+    """
+    # normcase: en Windows C:\Users y c:\users son la misma carpeta
+    claves = [(path, os.path.normcase(os.path.realpath(path))) for path in paths_to_scan]
+    kept = []
+    for clave in sorted({clave for _, clave in claves}, key=len):
+        if not any(clave.startswith(k if k.endswith(os.sep) else k + os.sep) for k in kept):
+            kept.append(clave)
+    kept = set(kept)
+
+    roots = []
+    for path, clave in claves:
+        if clave in kept:
+            kept.discard(clave) # Solo la primera aparición
+            roots.append(path)
+        else:
+            print(f"\n**Advertencia**: La ruta '{path}' ya está incluida en otra ruta a escanear. Saltando esta ubicación.")
+    return roots
+
+
+def _formatear_tamanos(large_files):
+    """
+    Formatea los tamaños de 'large_files' para una mejor lectura ('1.50 GB', '250.00 MB').
+    Las divisiones y la elección de unidad se hacen vectorizadas en NumPy.
+    """
+    sizes = np.array([size for size, _ in large_files], dtype=np.float64)
+    use_gb = sizes > _GB
+    vals = np.where(use_gb, sizes / _GB, sizes / _MB)
+    units = np.where(use_gb, ' GB', ' MB')
+    return [f"{v:.2f}{u}" for v, u in zip(vals.tolist(), units.tolist())]
+
+
+def find_large_files_in_paths(paths_to_scan, min_size_mb=100, top_k=None, quiet=False,
+                              cache_file=None, include_exts=None, exclude_exts=None):
+    """
+    Busca archivos mayores a 'min_size_mb' en las rutas proporcionadas.
+    Si se indica 'top_k' (>= 1), solo se conservan en memoria los 'top_k' archivos más
+    grandes; en ese caso no se toca el histórico, que debe reflejar todos los archivos.
+    Con 'quiet' no se muestra la barra de progreso.
+    'cache_file' (p. ej. 'scan_cache.parquet') guarda el mtime de cada directorio para
+    no releer en la siguiente ejecución los que no cambiaron; por defecto no se usa caché.
+    Con caché, un archivo que crece en su sitio no se vuelve a medir hasta que cambie su carpeta.
+    'include_exts' / 'exclude_exts' (p. ej. {'.iso', '.mkv'}) limitan los archivos
+    por extensión antes de consultar su tamaño; con ellos tampoco se toca el histórico.
+    """
+    if top_k is not None and top_k < 1:
+        raise ValueError(f"top_k debe ser mayor o igual a 1 (se recibió {top_k})")
+
+    # Convierte MB a Bytes; ceil porque los lectores (y la extensión en C) comparan enteros
+    # y 'tamaño >= ceil(x)' equivale a 'tamaño >= x' para 'min_size_mb' no entero
+    min_size_bytes = math.ceil(min_size_mb * _MB)
+    include_exts = _normalizar_extensiones(include_exts)
+    exclude_exts = _normalizar_extensiones(exclude_exts)
+    accept_name = _crear_filtro_extensiones(include_exts, exclude_exts)
+    ext_filters = [sorted(exts) if exts is not None else None for exts in (include_exts, exclude_exts)]
+    large_files = [] # Lista de archivos (min-heap por tamaño si hay 'top_k')
 
     print(f"Buscando archivos mayores a {min_size_mb} MB en las rutas especificadas...")
     print("-" * 50) # Línea separadora
     print("⚠️  Carpetas excluidas por seguridad:")
-    for subdir in excluded_dirs:
+    for subdir in sorted(EXCLUDED_DIRS):
         print(f"    - {subdir}")
+    if include_exts is not None:
+        print(f"Solo extensiones: {', '.join(sorted(include_exts))}")
+    if exclude_exts is not None:
+        print(f"Extensiones excluidas: {', '.join(sorted(exclude_exts))}")
     print("-" * 50, end='\n\n') # Línea separadora
 
     # --- FASE 1: Recopilación de archivos grandes ---
-    for path in paths_to_scan:
+    if cache_file is not None:
+        cache = _cargar_cache(cache_file, EXCLUDED_DIRS, min_size_bytes, ext_filters)
+        new_cache = []
+    else:
+        cache = new_cache = None
+
+    scanned_roots = [] # Rutas recorridas, para saber qué partes de la caché se renuevan
+    for path in _deduplicar_rutas(paths_to_scan):
         if not os.path.isdir(path):
             print(f"\n**Advertencia**: La ruta '{path}' no existe o no es válida. Saltando esta ubicación.")
             continue
-
-        # Contar directorios, ignorando los excluidos
-        total_dirs = 0
-        try:
-            for _, dirnames, _ in os.walk(path):
-                dirnames[:] = [d for d in dirnames if d not in excluded_dirs]
-                total_dirs += len(dirnames) + 1 # +1 para el directorio actual
-        except Exception as e:
-            total_dirs = 0 # Si hay un error al contar, simplemente no mostramos el total exacto
-            print(f"No se pudo obtener el conteo exacto de directorios en '{path}': {e}. La barra de progreso será en modo iteración.")
+        scanned_roots.append(path)
 
         # Recorrer la carpeta
-        with tqdm(total=total_dirs if total_dirs > 0 else None,
-                  desc=f"{path}: ",
-                  unit="dir", leave=True) as pbar:
-
-            for dirpath, dirnames, filenames in os.walk(path):
-                '''
-                dirpath: La ruta completa del directorio actual.
-                dirnames: Una lista de los nombres de los subdirectorios que se encuentran directamente en dirpath.
-                filenames: Una lista de los nombres de los archivos que se encuentran directamente en dirpath.
-                '''
-                # Filtrar los directorios excluidos
-                dirnames[:] = [d for d in dirnames if d not in excluded_dirs]
-
-                for filename in filenames:
-                    file_path = os.path.join(dirpath, filename)
-                    try:
-                        if os.path.isfile(file_path):
-                            file_size = os.path.getsize(file_path)
-                            if file_size >= min_size_bytes:
-                                large_files.append((file_size, file_path))
-                    except OSError:
-                        # Ignorar errores de acceso (permisos denegados, etc.)
-                        pass
-                pbar.update(1) # Actualiza la barra por cada directorio visitado
+        # Sin total: la barra avanza por directorio visitado sin recorrer el árbol dos veces
+        if quiet:
+            progress = nullcontext()
+        else:
+            progress = tqdm(total=None,
+                            desc=f"{path}: ",
+                            unit="dir", leave=True, mininterval=0.5)
+        with progress as pbar:
+
+            for file_info in _scan(path, EXCLUDED_DIRS, min_size_bytes, pbar, cache, new_cache,
+                                   accept_name):
+                if top_k is None:
+                    large_files.append(file_info)
+                elif len(large_files) < top_k:
+                    heapq.heappush(large_files, file_info)
+                elif file_info > large_files[0]:
+                    # Sustituye al más pequeño de los 'top_k' conservados
+                    heapq.heapreplace(large_files, file_info)
+
+    if cache_file is not None:
+        _guardar_cache(cache_file, new_cache, cache, scanned_roots, EXCLUDED_DIRS, min_size_bytes,
+                       ext_filters)
+        del cache, new_cache
 
     # --- FASE 2: Procesamiento y presentación de resultados ---
-    results = {
-        'File_Name': [],
-        'File_Size': []
-    }
-    large_files.sort(key=lambda x: x[0], reverse=True)
+    if top_k is not None:
+        # Solo quedan 'top_k' elementos: ordenarlos es O(k log k)
+        large_files.sort(reverse=True)
+    else:
+        # Ordenar por tamaño (descendente); la clave se calcula una vez por elemento
+        large_files.sort(key=itemgetter(0), reverse=True)
 
     print("\n\n--- Archivos grandes encontrados (ordenados por tamaño) ---")
     if not large_files:
         print(f"No se encontraron archivos mayores a {min_size_mb} MB en las rutas especificadas.")
     else:
-        for size, path in large_files:
-            # Formatear el tamaño para una mejor lectura
-            if size > (1024**3):
-                size_str = f"{size / (1024**3):.2f} GB"
-            else:
-                size_str = f"{size / (1024**2):.2f} MB"
-            
-            results['File_Name'].append(path)
-            results['File_Size'].append(size)
+        for (_, path), size_str in zip(large_files, _formatear_tamanos(large_files)):
             print(f"- {size_str}: {path}")
 
-    # --- FASE 3: Guardar historico en un csv si no existe ---
-    control_changes_file = 'control_changes.csv'
+    # --- FASE 3: Guardar historico en un parquet si no existe ---
+    if top_k is not None:
+        # Con la lista recortada, los archivos que quedaron fuera saldrían como ELIMINADOS
+        print(f"\nCon top_k={top_k} no se compara ni se actualiza el histórico.")
+        return
+    if accept_name is not None:
+        # Igual con el filtro de extensiones: los archivos filtrados saldrían como ELIMINADOS
+        print("\nCon filtro de extensiones no se compara ni se actualiza el histórico.")
+        return
 
-    # Crear un DataFrame a partir del diccionario
-    df = pd.DataFrame(results)
+    control_changes_file = 'control_changes.parquet'
 
-    # Guardar el DataFrame a un archivo CSV
-    gestionar_csv_cambios(df, control_changes_file)
+    # Crear el DataFrame directamente desde las tuplas (tamaño, ruta), en una sola pasada
+    df = pd.DataFrame.from_records(large_files, columns=['File_Size', 'File_Name'])
+    df = df[['File_Name', 'File_Size']]
+    del large_files # Liberar la lista antes de comparar con el histórico
+
+    # Guardar el DataFrame a un archivo Parquet
+    gestionar_cambios(df, control_changes_file)
 
 # --- Configuración principal (modifica esto) ---
 if __name__ == "__main__":
@@ -161,5 +555,20 @@ if __name__ == "__main__":
         'C:\\Program Files',
     ]
 
+    parser = argparse.ArgumentParser(description="Busca archivos grandes en las rutas configuradas.")
+    parser.add_argument('--quiet', action='store_true',
+                        help="no mostrar la barra de progreso")
+    parser.add_argument('--top-k', type=int, default=None, metavar='N',
+                        help="mostrar solo los N archivos más grandes (no actualiza el histórico)")
+    parser.add_argument('--cache-file', default=None, metavar='ARCHIVO',
+                        help="caché de directorios (p. ej. scan_cache.parquet) para no releer "
+                             "los que no cambiaron; un archivo que crece en su sitio (discos de "
+                             "máquinas virtuales, bases de datos, logs) no se vuelve a medir "
+                             "mientras no cambie el mtime de su carpeta")
+    args = parser.parse_args()
+    if args.top_k is not None and args.top_k < 1:
+        parser.error("--top-k debe ser mayor o igual a 1")
+
     # Ejecuta la función principal
-    find_large_files_in_paths(my_paths)
\ No newline at end of file
+    find_large_files_in_paths(my_paths, top_k=args.top_k, quiet=args.quiet,
+                              cache_file=args.cache_file)
\ No newline at end of file
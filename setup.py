@@ -0,0 +1,8 @@
+from setuptools import Extension, setup
+
+# Extensión opcional en C para recorrer directorios en Linux.
+# Compilar junto a main.py con: python setup.py build_ext --inplace
+setup(
+    name='search_files_by_size',
+    ext_modules=[Extension('_fastscan', ['_fastscan.c'])],
+)
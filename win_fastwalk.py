@@ -0,0 +1,134 @@
+"""
+Lectura de directorios en Windows con FindFirstFileExW (vía ctypes).
+
+os.scandir usa FindFirstFileW, que obliga al sistema de archivos a calcular el
+nombre corto 8.3 (cAlternateFileName) de cada entrada. Con FindExInfoBasic ese
+trabajo se omite y con FIND_FIRST_EX_LARGE_FETCH el kernel devuelve las entradas
+en lotes más grandes. El tamaño y los atributos vienen en WIN32_FIND_DATAW, así
+que nunca se hace una llamada stat adicional.
+"""
+import ctypes
+import os
+from ctypes import wintypes
+
+FIND_EX_INFO_BASIC = 1
+FIND_EX_SEARCH_NAME_MATCH = 0
+FIND_FIRST_EX_LARGE_FETCH = 2
+
+FILE_ATTRIBUTE_DIRECTORY = 0x10
+FILE_ATTRIBUTE_REPARSE_POINT = 0x400
+
+# Etiquetas de reanálisis (en dwReserved0) que son enlaces; el resto (marcadores de
+# OneDrive, deduplicación, etc.) son archivos/carpetas normales, como en os.scandir
+IO_REPARSE_TAG_MOUNT_POINT = 0xA0000003
+IO_REPARSE_TAG_SYMLINK = 0xA000000C
+_LINK_REPARSE_TAGS = frozenset({IO_REPARSE_TAG_MOUNT_POINT, IO_REPARSE_TAG_SYMLINK})
+
+INVALID_HANDLE_VALUE = wintypes.HANDLE(-1).value
+
+# 1970-01-01 expresado en intervalos de 100 ns desde 1601-01-01
+_EPOCH_AS_FILETIME = 116444736000000000
+
+_kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
+
+_FindFirstFileExW = _kernel32.FindFirstFileExW
+_FindFirstFileExW.argtypes = [
+    wintypes.LPCWSTR,                           # lpFileName
+    ctypes.c_int,                               # fInfoLevelId
+    ctypes.POINTER(wintypes.WIN32_FIND_DATAW),  # lpFindFileData
+    ctypes.c_int,                               # fSearchOp
+    wintypes.LPVOID,                            # lpSearchFilter
+    wintypes.DWORD,                             # dwAdditionalFlags
+]
+_FindFirstFileExW.restype = wintypes.HANDLE
+
+_FindNextFileW = _kernel32.FindNextFileW
+_FindNextFileW.argtypes = [wintypes.HANDLE, ctypes.POINTER(wintypes.WIN32_FIND_DATAW)]
+_FindNextFileW.restype = wintypes.BOOL
+
+_FindClose = _kernel32.FindClose
+_FindClose.argtypes = [wintypes.HANDLE]
+_FindClose.restype = wintypes.BOOL
+
+
+def _filetime_to_ns(filetime):
+    # FILETIME cuenta intervalos de 100 ns desde 1601; st_mtime_ns cuenta ns desde 1970
+    return (((filetime.dwHighDateTime << 32) | filetime.dwLowDateTime)
+            - _EPOCH_AS_FILETIME) * 100
+
+
+def _find_first(parent):
+    data = wintypes.WIN32_FIND_DATAW()
+    handle = _FindFirstFileExW(parent + '*', FIND_EX_INFO_BASIC,
+                               ctypes.byref(data), FIND_EX_SEARCH_NAME_MATCH,
+                               None, FIND_FIRST_EX_LARGE_FETCH)
+    return handle, data
+
+
+def _read_dir(handle, data, parent, excluded_dirs, min_size_bytes, accept_name):
+    """
+    Recorre las entradas de 'handle' empezando por la que ya está en 'data' y
+    devuelve (subdirectorios, archivos). 'parent' es la ruta con separador final.
+    """
+    subdirs = []
+    files = []
+    while True:
+        name = data.cFileName
+        attrs = data.dwFileAttributes
+        is_link = (attrs & FILE_ATTRIBUTE_REPARSE_POINT
+                   and data.dwReserved0 in _LINK_REPARSE_TAGS)
+        if name not in ('.', '..') and not is_link:
+            if attrs & FILE_ATTRIBUTE_DIRECTORY:
+                # Filtrar los directorios excluidos
+                if name not in excluded_dirs:
+                    subdirs.append(parent + name)
+            elif accept_name is None or accept_name(name):
+                size = (data.nFileSizeHigh << 32) | data.nFileSizeLow
+                if size >= min_size_bytes:
+                    files.append((size, parent + name))
+        if not _FindNextFileW(handle, ctypes.byref(data)):
+            break
+    return subdirs, files
+
+
+def scan_dir(dir_path, excluded_dirs, min_size_bytes, accept_name=None):
+    """
+    Equivalente a main._scan_dir usando FindFirstFileExW: devuelve
+    (subdirectorios, archivos), donde 'archivos' son tuplas (tamaño, ruta)
+    mayores o iguales a 'min_size_bytes' y aceptados por 'accept_name' (si hay).
+    Los enlaces simbólicos y junctions no se siguen.
+    """
+    # Prefijo con separador final, calculado una vez por directorio: cada hijo es 'parent + nombre'
+    parent = dir_path if dir_path.endswith(os.sep) else dir_path + os.sep
+    handle, data = _find_first(parent)
+    if handle == INVALID_HANDLE_VALUE:
+        # No se pudo abrir el directorio (permisos denegados, etc.)
+        return [], []
+
+    try:
+        return _read_dir(handle, data, parent, excluded_dirs, min_size_bytes, accept_name)
+    finally:
+        _FindClose(handle)
+
+
+def scan_dir_cached(dir_path, excluded_dirs, min_size_bytes, accept_name, cached_mtime):
+    """
+    Equivalente a main._scan_dir_cached: devuelve (mtime_ns, subdirectorios, archivos).
+    El mtime es el ftLastWriteTime de la entrada '.', la primera que devuelve
+    FindFirstFileExW; si coincide con 'cached_mtime', el resto no se lee y se
+    devuelve (mtime_ns, None, None). Las raíces de unidad no tienen entrada '.',
+    así que su mtime es None y siempre se leen.
+    """
+    parent = dir_path if dir_path.endswith(os.sep) else dir_path + os.sep
+    handle, data = _find_first(parent)
+    if handle == INVALID_HANDLE_VALUE:
+        # No se pudo abrir el directorio (permisos denegados, etc.)
+        return None, [], []
+
+    try:
+        mtime = _filetime_to_ns(data.ftLastWriteTime) if data.cFileName == '.' else None
+        if mtime is not None and mtime == cached_mtime:
+            return mtime, None, None
+        return (mtime,) + _read_dir(handle, data, parent, excluded_dirs, min_size_bytes, accept_name)
+    finally:
+        _FindClose(handle)